@@ -3,9 +3,10 @@ from __future__ import annotations
 import os
 import sys
 from collections import defaultdict
+from io import StringIO
 from pathlib import Path
-from collections import defaultdict
 
+import httpx
 import streamlit as st
 from openai import OpenAI
 
@@ -23,51 +24,154 @@ def openai_client() -> OpenAI:
     key = os.getenv("OPENAI_API_KEY")
     if not key:
         raise ValueError("OPENAI_API_KEY is required")
-    return OpenAI(api_key=key)
+    http_client = httpx.Client(
+        http2=True,
+        timeout=60,
+        limits=httpx.Limits(max_keepalive_connections=10),
+    )
+    return OpenAI(api_key=key, http_client=http_client)
+
+
+# cache_resource keeps entries across reruns without copying them; the tuple
+# return value is immutable, so sharing it between sessions is safe.
+@st.cache_resource(max_entries=256)
+def _embed_normalized_query(normalized: str) -> tuple[float, ...]:
+    response = openai_client().embeddings.create(model="text-embedding-3-small", input=[normalized])
+    return tuple(response.data[0].embedding)
 
 
 def embed_query(query: str) -> list[float]:
-    response = openai_client().embeddings.create(model="text-embedding-3-small", input=[query])
-    return response.data[0].embedding
+    # Case and whitespace variants of a question share one cached embedding.
+    normalized = " ".join(query.lower().split())
+    return list(_embed_normalized_query(normalized))
+
 
+# Sidebar data only changes when ingestion runs, so it is not re-queried on
+# every widget interaction.
+SIDEBAR_CACHE_TTL_SECONDS = 300
 
+
+@st.cache_data(ttl=SIDEBAR_CACHE_TTL_SECONDS)
 def fetch_folder_prefixes() -> list[str]:
+    # Distinct paths come from a loose index scan over idx_chunks_folder_path
+    # (one index probe per distinct path rather than a pass over every chunk);
+    # every leading run of path segments ("a", "a/b", ...) is then a prefix.
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT DISTINCT folder_path FROM chunks WHERE folder_path IS NOT NULL AND folder_path <> ''")
-            rows = [row[0] for row in cur.fetchall()]
-    prefixes = set()
-    for path in rows:
-        current = []
-        for part in path.split("/"):
-            current.append(part)
-            prefixes.add("/".join(current))
-    return sorted(prefixes)
+            cur.execute(
+                """
+                WITH RECURSIVE paths AS (
+                    (SELECT folder_path FROM chunks WHERE folder_path > '' ORDER BY folder_path LIMIT 1)
+                    UNION ALL
+                    SELECT (
+                        SELECT c.folder_path FROM chunks c
+                        WHERE c.folder_path > p.folder_path
+                        ORDER BY c.folder_path
+                        LIMIT 1
+                    )
+                    FROM paths p
+                    WHERE p.folder_path IS NOT NULL
+                )
+                SELECT prefix
+                FROM (
+                    SELECT DISTINCT array_to_string(parts[1:i], '/') AS prefix
+                    FROM (
+                        SELECT string_to_array(folder_path, '/') AS parts
+                        FROM paths
+                        WHERE folder_path IS NOT NULL
+                    ) AS split,
+                    generate_subscripts(parts, 1) AS i
+                ) AS prefixes
+                ORDER BY prefix COLLATE "C"
+                """
+            )
+            return [row[0] for row in cur.fetchall()]
+
+
+RETRIEVAL_COLUMNS = """
+    doc_title, folder_path, doc_modified_time, doc_url, source_type,
+    page_or_slide, text_origin, text
+"""
+MIN_EF_SEARCH = 40
+# pgvector rejects hnsw.ef_search above this.
+MAX_EF_SEARCH = 1000
+# Candidates pulled from the binary-quantized index and re-ranked on halfvec.
+RERANK_CANDIDATES = 200
+# Filtered searches add this many candidates per requested chunk on top of
+# the rerank pool, since the folder predicate discards part of it.
+FOLDER_CANDIDATE_FACTOR = 10
+FOLDER_WHERE = "WHERE folder_path = %(folder)s OR folder_path LIKE %(folder_prefix)s"
+
+
+def _ranked_sql(where: str = "") -> str:
+    # Distance is computed once in the subquery and reused by ORDER BY.
+    return f"""
+        SELECT {RETRIEVAL_COLUMNS}, distance
+        FROM (
+            SELECT {RETRIEVAL_COLUMNS},
+                   (embedding <=> %(q)s::vector::halfvec) AS distance
+            FROM chunks
+            {where}
+        ) AS scored
+        ORDER BY distance
+        LIMIT %(top_k)s
+    """
+
+
+def _reranked_sql(where: str = "") -> str:
+    # Stage 1 walks the HNSW index on binary_quantize(embedding) by Hamming
+    # distance; stage 2 orders the short list by cosine distance on halfvec.
+    dim = get_embedding_dim()
+    return f"""
+        WITH candidates AS (
+            SELECT {RETRIEVAL_COLUMNS}, embedding
+            FROM chunks
+            ORDER BY binary_quantize(embedding)::bit({dim}) <~> binary_quantize(%(q)s::vector)::bit({dim})
+            LIMIT %(candidates)s
+        )
+        SELECT {RETRIEVAL_COLUMNS}, distance
+        FROM (
+            SELECT {RETRIEVAL_COLUMNS},
+                   (embedding <=> %(q)s::vector::halfvec) AS distance
+            FROM candidates
+            {where}
+        ) AS scored
+        ORDER BY distance
+        LIMIT %(top_k)s
+    """
 
 
 def retrieval(query_embedding: list[float], top_k: int, folder_filter: str | None):
+    candidates = RERANK_CANDIDATES
+    params = {"q": query_embedding, "top_k": top_k}
     where = ""
-    params = [query_embedding, top_k]
     if folder_filter:
-        where = "WHERE folder_path = %s OR folder_path LIKE %s"
-        params = [query_embedding, folder_filter, f"{folder_filter}/%", top_k]
-
-    sql = f"""
-        SELECT doc_title, folder_path, doc_modified_time, doc_url, source_type,
-               page_or_slide, text_origin, text,
-               (embedding <=> %s::vector) AS distance
-        FROM chunks
-        {where}
-        ORDER BY distance
-        LIMIT %s
-    """
+        # Filter the over-fetched candidate set instead of letting the
+        # predicate push the planner into an exact scan.
+        candidates = min(MAX_EF_SEARCH, RERANK_CANDIDATES + top_k * FOLDER_CANDIDATE_FACTOR)
+        params.update(folder=folder_filter, folder_prefix=f"{folder_filter}/%")
+        where = FOLDER_WHERE
+    params["candidates"] = candidates
+
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, params)
+            # An HNSW scan returns at most ef_search rows.
+            cur.execute(
+                "SELECT set_config('hnsw.ef_search', %s, true)",
+                (str(max(MIN_EF_SEARCH, candidates)),),
+            )
+            cur.execute(_reranked_sql(where), params)
             rows = cur.fetchall()
+            if folder_filter and len(rows) < top_k:
+                # Folder is too sparse among the ANN candidates: search it exactly,
+                # reaching its rows through a bitmap scan on the folder_path indexes.
+                cur.execute("SELECT set_config('enable_indexscan', 'off', true)")
+                cur.execute(_ranked_sql(FOLDER_WHERE), params)
+                rows = cur.fetchall()
     return rows
 
 
+@st.cache_data(ttl=SIDEBAR_CACHE_TTL_SECONDS)
 def status_summary() -> dict:
     with get_conn() as conn:
         with conn.cursor() as cur:
@@ -80,21 +184,52 @@ def status_summary() -> dict:
     }
 
 
+# Each source's text is capped before prompting; long chunks add input tokens
+# (cost and time-to-first-token) faster than they add useful context.
+MAX_CONTEXT_CHARS_PER_SOURCE = 700
+SOURCE_TEMPLATE = (
+    "[Source {i}]\n"
+    "Title: {title}\n"
+    "Location: {source_type} {page_or_slide}\n"
+    "Folder: {folder_path}\n"
+    "Last Updated: {modified_time}\n"
+    "URL: {doc_url}\n"
+    "Text Origin: {text_origin}\n"
+    "Content:\n{text}\n"
+)
+
+
+def _clip_source_text(text: str, limit: int = MAX_CONTEXT_CHARS_PER_SOURCE) -> str:
+    if len(text) <= limit:
+        return text
+    clipped = text[:limit]
+    # Prefer ending on a sentence or line break when one falls in the back half.
+    boundary = max(clipped.rfind(". "), clipped.rfind("\n"))
+    if boundary >= limit // 2:
+        return clipped[: boundary + 1].rstrip()
+    return clipped
+
+
 def build_context(rows) -> str:
-    blocks = []
+    buf = StringIO()
     for i, row in enumerate(rows, start=1):
         doc_title, folder_path, modified_time, doc_url, source_type, page_or_slide, text_origin, text, _ = row
-        blocks.append(
-            f"[Source {i}]\n"
-            f"Title: {doc_title}\n"
-            f"Location: {source_type} {page_or_slide}\n"
-            f"Folder: {folder_path}\n"
-            f"Last Updated: {modified_time}\n"
-            f"URL: {doc_url}\n"
-            f"Text Origin: {text_origin}\n"
-            f"Content:\n{text}\n"
+        if i > 1:
+            buf.write("\n")
+        buf.write(
+            SOURCE_TEMPLATE.format(
+                i=i,
+                title=doc_title,
+                source_type=source_type,
+                page_or_slide=page_or_slide,
+                folder_path=folder_path,
+                modified_time=modified_time,
+                doc_url=doc_url,
+                text_origin=text_origin,
+                text=_clip_source_text(text),
+            )
         )
-    return "\n".join(blocks)
+    return buf.getvalue()
 
 
 def generate_answer(question: str, context: str) -> str:
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
+import atexit
 import os
+import threading
 from contextlib import contextmanager
 from pathlib import Path
 from typing import Generator
 
 import psycopg
 from pgvector.psycopg import register_vector
+from psycopg_pool import ConnectionPool
 
 SCHEMA_PATH = Path(__file__).with_name("schema.sql")
 
+_POOL: ConnectionPool | None = None
+_POOL_LOCK = threading.Lock()
+
 
 def get_database_url() -> str:
     database_url = os.getenv("DATABASE_URL")
@@ -22,21 +28,44 @@ def get_embedding_dim() -> int:
     return int(os.getenv("EMBEDDING_DIM", "1536"))
 
 
+def _configure_conn(conn: psycopg.Connection) -> None:
+    register_vector(conn)
+    # The type lookup opens a transaction; the pool requires idle connections.
+    conn.commit()
+
+
+def _get_pool() -> ConnectionPool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                pool = ConnectionPool(
+                    get_database_url(),
+                    min_size=int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                    kwargs={"autocommit": False},
+                    configure=_configure_conn,
+                    open=True,
+                )
+                atexit.register(pool.close)
+                _POOL = pool
+    return _POOL
+
+
 @contextmanager
 def get_conn() -> Generator[psycopg.Connection, None, None]:
-    conn = psycopg.connect(get_database_url(), autocommit=False)
-    register_vector(conn)
-    try:
+    """Borrow a pooled connection; open work is committed on exit, rolled back on error."""
+    with _get_pool().connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
 def init_db() -> None:
     schema_template = SCHEMA_PATH.read_text()
     schema_sql = schema_template.replace("__EMBEDDING_DIM__", str(get_embedding_dim()))
 
-    with get_conn() as conn:
+    # Not pooled: pooled connections register the vector type, which does not
+    # exist until the schema has created the extension.
+    with psycopg.connect(get_database_url(), autocommit=False) as conn:
         with conn.cursor() as cur:
             cur.execute(schema_sql)
         conn.commit()
@@ -23,15 +23,44 @@ CREATE TABLE IF NOT EXISTS chunks (
   page_or_slide INT,
   text_origin TEXT CHECK (text_origin IN ('native_text','ocr')),
   text TEXT,
+  embedding HALFVEC(__EMBEDDING_DIM__),
+  created_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS chunk_embeddings_cache (
+  text_sha256 BYTEA PRIMARY KEY,
+  model TEXT NOT NULL,
   embedding VECTOR(__EMBEDDING_DIM__),
   created_at TIMESTAMPTZ DEFAULT now()
 );
 
 CREATE INDEX IF NOT EXISTS idx_chunks_drive_file_id ON chunks(drive_file_id);
 CREATE INDEX IF NOT EXISTS idx_chunks_folder_path ON chunks(folder_path);
+-- Serves the folder-prefix LIKE filter regardless of collation.
+CREATE INDEX IF NOT EXISTS idx_chunks_folder_path_pattern ON chunks(folder_path text_pattern_ops);
 CREATE INDEX IF NOT EXISTS idx_documents_folder_path ON documents(folder_path);
 
--- Requires ANALYZE after substantial inserts.
-CREATE INDEX IF NOT EXISTS idx_chunks_embedding_ivfflat
-ON chunks USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
+-- Earlier full-precision vector indexes; superseded by the binary-quantized one below.
+DROP INDEX IF EXISTS idx_chunks_embedding_ivfflat;
+DROP INDEX IF EXISTS idx_chunks_embedding_hnsw;
+
+-- Chunk embeddings are stored as halfvec (requires pgvector >= 0.7).
+-- Convert tables created with the older VECTOR column in place.
+DO $$
+BEGIN
+  IF (
+    SELECT format_type(atttypid, atttypmod)
+    FROM pg_attribute
+    WHERE attrelid = 'chunks'::regclass AND attname = 'embedding'
+  ) <> 'halfvec(__EMBEDDING_DIM__)' THEN
+    ALTER TABLE chunks
+      ALTER COLUMN embedding TYPE HALFVEC(__EMBEDDING_DIM__)
+      USING embedding::halfvec(__EMBEDDING_DIM__);
+  END IF;
+END
+$$;
+
+-- Retrieval walks this index by Hamming distance, then re-ranks on halfvec.
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_bq_hnsw
+ON chunks USING hnsw ((binary_quantize(embedding)::bit(__EMBEDDING_DIM__)) bit_hamming_ops)
+WITH (m = 16, ef_construction = 64);
@@ -6,15 +6,11 @@ from ingest.models import ChunkRecord, DriveFile, ExtractedUnit
 def split_text(text: str, chunk_size: int, overlap: int) -> list[str]:
     if len(text) <= chunk_size:
         return [text]
-    chunks: list[str] = []
-    start = 0
-    while start < len(text):
-        end = min(len(text), start + chunk_size)
-        chunks.append(text[start:end])
-        if end == len(text):
-            break
-        start = max(0, end - overlap)
-    return chunks
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError("overlap must be smaller than chunk_size")
+    # Window starts are fixed strides; the last window is the first to reach the end.
+    return [text[start : start + chunk_size] for start in range(0, len(text) - overlap, step)]
 
 
 def build_chunks(
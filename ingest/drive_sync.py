@@ -16,6 +16,8 @@ from dateutil import parser as dt_parser
 from ingest.models import DriveFile
 
 FOLDER_MIME = "application/vnd.google-apps.folder"
+# Sidecar in the cache dir: cache file name -> [st_mtime_ns, st_size, sha256 hex].
+HASH_INDEX_NAME = "hashes.json"
 
 
 @dataclass
@@ -27,7 +29,9 @@ class DriveNode:
 
 
 class DriveProvider(Protocol):
-    def list_files_recursive(self, folder_id: str) -> Iterable[DriveFile]: ...
+    def list_files_recursive(
+        self, folder_id: str, known_mtimes: dict[str, datetime] | None = None
+    ) -> Iterable[DriveFile]: ...
 
 
 class PublicDriveWebProvider:
@@ -40,19 +44,38 @@ class PublicDriveWebProvider:
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.session = requests.Session()
-
-    def list_files_recursive(self, folder_id: str) -> Iterable[DriveFile]:
-        yield from self._walk_folder(folder_id, [])
-
-    def _walk_folder(self, folder_id: str, path_parts: list[str]) -> Iterable[DriveFile]:
+        self.hash_index_path = self.cache_dir / HASH_INDEX_NAME
+        self._hash_index = self._load_hash_index()
+
+    def list_files_recursive(
+        self, folder_id: str, known_mtimes: dict[str, datetime] | None = None
+    ) -> Iterable[DriveFile]:
+        """Walk the folder tree, downloading files into the local cache.
+
+        ``known_mtimes`` maps drive_file_id to the modified_time already ingested;
+        files no newer than that whose cached copy exists are not re-downloaded.
+        """
+        try:
+            yield from self._walk_folder(folder_id, [], known_mtimes or {})
+        finally:
+            self._save_hash_index()
+
+    def _walk_folder(
+        self, folder_id: str, path_parts: list[str], known_mtimes: dict[str, datetime]
+    ) -> Iterable[DriveFile]:
         nodes = self._list_folder_nodes(folder_id)
         for node in nodes:
             if node.mime_type == FOLDER_MIME:
-                yield from self._walk_folder(node.id, path_parts + [node.name])
+                yield from self._walk_folder(node.id, path_parts + [node.name], known_mtimes)
                 continue
 
             folder_path = "/".join(path_parts) if path_parts else ""
-            local_path = self._download_file(node.id, node.name)
+            cached_path = self._cache_path(node.id, node.name)
+            known_mtime = known_mtimes.get(node.id)
+            if node.modified_time and known_mtime and node.modified_time <= known_mtime and cached_path.exists():
+                local_path, file_hash = cached_path, self._cached_hash(cached_path)
+            else:
+                local_path, file_hash = self._download_file(node.id, node.name)
             yield DriveFile(
                 drive_file_id=node.id,
                 name=node.name,
@@ -61,6 +84,7 @@ class PublicDriveWebProvider:
                 modified_time=node.modified_time,
                 local_path=local_path,
                 doc_url=f"https://drive.google.com/file/d/{node.id}/view",
+                content_hash=file_hash,
             )
 
     def _list_folder_nodes(self, folder_id: str) -> list[DriveNode]:
@@ -101,21 +125,54 @@ class PublicDriveWebProvider:
             )
         return nodes
 
-    def _download_file(self, file_id: str, name: str) -> Path:
+    def _load_hash_index(self) -> dict[str, list]:
+        try:
+            return json.loads(self.hash_index_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_hash_index(self) -> None:
+        tmp_path = self.hash_index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._hash_index))
+        tmp_path.replace(self.hash_index_path)
+
+    def _remember_hash(self, path: Path, digest: str) -> None:
+        stat = path.stat()
+        self._hash_index[path.name] = [stat.st_mtime_ns, stat.st_size, digest]
+
+    def _cached_hash(self, path: Path) -> str:
+        """Digest of a cached file, re-hashing only if its mtime or size changed."""
+        stat = path.stat()
+        entry = self._hash_index.get(path.name)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        digest = content_hash(path)
+        self._remember_hash(path, digest)
+        return digest
+
+    def _cache_path(self, file_id: str, name: str) -> Path:
         safe_name = re.sub(r"[^\w.\- ]+", "_", name)
         ext = Path(safe_name).suffix
         cache_name = f"{file_id}{ext}" if ext else file_id
-        output = self.cache_dir / cache_name
+        return self.cache_dir / cache_name
+
+    def _download_file(self, file_id: str, name: str) -> tuple[Path, str]:
+        """Download to the cache, hashing bytes as they stream; returns (path, sha256 hex)."""
+        output = self._cache_path(file_id, name)
 
         url = "https://drive.google.com/uc"
         params = {"export": "download", "id": file_id}
+        h = hashlib.sha256()
         with self.session.get(url, params=params, stream=True, timeout=60) as r:
             r.raise_for_status()
             with output.open("wb") as fh:
                 for chunk in r.iter_content(chunk_size=1024 * 128):
                     if chunk:
+                        h.update(chunk)
                         fh.write(chunk)
-        return output
+        digest = h.hexdigest()
+        self._remember_hash(output, digest)
+        return output, digest
 
 
 def resolve_drive_folder_id() -> str:
@@ -123,8 +180,6 @@ def resolve_drive_folder_id() -> str:
 
 
 def content_hash(path: Path) -> str:
-    h = hashlib.sha256()
-    with path.open("rb") as fh:
-        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
-            h.update(chunk)
-    return h.hexdigest()
+    # file_digest (Python 3.11+) runs the read/update loop in C.
+    with path.open("rb", buffering=0) as fh:
+        return hashlib.file_digest(fh, "sha256").hexdigest()
@@ -1,31 +1,158 @@
 from __future__ import annotations
 
+import hashlib
 import os
+import threading
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Sequence
+from typing import Iterator, Sequence
 
+import httpx
+import psycopg
 from openai import OpenAI
+from pgvector import HalfVector
 
 from db.client import get_conn
 from ingest.models import ChunkRecord, DriveFile
 
+EMBED_BATCH_SIZE = 96
+# OpenAI caps a single embeddings request at 2048 inputs and ~300k tokens.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+
+_OPENAI_CLIENT: OpenAI | None = None
+_OPENAI_CLIENT_LOCK = threading.Lock()
+
 
 def _openai_client() -> OpenAI:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY is required")
-    return OpenAI(api_key=api_key)
+    # One process-wide client: concurrent embedding batches share keep-alive
+    # HTTP/2 connections instead of each paying a TLS handshake. The lock stops
+    # the first flush workers from each building their own.
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        with _OPENAI_CLIENT_LOCK:
+            if _OPENAI_CLIENT is None:
+                api_key = os.getenv("OPENAI_API_KEY")
+                if not api_key:
+                    raise ValueError("OPENAI_API_KEY is required")
+                http_client = httpx.Client(
+                    http2=True,
+                    timeout=60,
+                    limits=httpx.Limits(max_keepalive_connections=10),
+                )
+                _OPENAI_CLIENT = OpenAI(api_key=api_key, http_client=http_client)
+    return _OPENAI_CLIENT
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
 
 
-def embed_texts(texts: Sequence[str], model: str = "text-embedding-3-small") -> list[list[float]]:
-    client = _openai_client()
-    response = client.embeddings.create(model=model, input=list(texts))
-    return [item.embedding for item in response.data]
+def _iter_batches(texts: Sequence[str], batch_size: int) -> Iterator[list[str]]:
+    batch_size = min(batch_size, MAX_INPUTS_PER_REQUEST)
+    batch: list[str] = []
+    batch_tokens = 0
+    for text in texts:
+        tokens = _estimate_tokens(text)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > MAX_TOKENS_PER_REQUEST):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
 
 
-def upsert_document(drive_file: DriveFile, status: str, content_hash: str | None, error: str | None = None) -> None:
+def _embedding_key(text: str, model: str) -> bytes:
+    return hashlib.sha256((model + "\0" + text).encode("utf-8")).digest()
+
+
+def _to_float_list(value) -> list[float]:
+    # The vector loader returns numpy arrays on pgvector-python < 0.5 and
+    # pgvector.Vector from 0.5 on.
+    if hasattr(value, "to_list"):
+        return value.to_list()
+    return value.tolist()
+
+
+def _fetch_cached_embeddings(keys: Sequence[bytes]) -> dict[bytes, list[float]]:
     with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT text_sha256, embedding FROM chunk_embeddings_cache WHERE text_sha256 = ANY(%s)",
+                (list(keys),),
+            )
+            return {bytes(row[0]): _to_float_list(row[1]) for row in cur.fetchall()}
+
+
+def _store_cached_embeddings(rows: Sequence[tuple[bytes, str, list[float]]]) -> None:
+    # Concurrent ingest batches may insert overlapping keys; taking the unique-key
+    # locks in one global order keeps them from deadlocking on each other.
+    rows = sorted(rows, key=lambda row: row[0])
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO chunk_embeddings_cache (text_sha256, model, embedding)
+                VALUES (%s,%s,%s)
+                ON CONFLICT (text_sha256) DO NOTHING
+                """,
+                rows,
+            )
+        conn.commit()
+
+
+def embed_texts(
+    texts: Sequence[str],
+    model: str = "text-embedding-3-small",
+    batch_size: int = EMBED_BATCH_SIZE,
+) -> list[list[float]]:
+    """Embed texts, reusing cached embeddings for text already seen with this model."""
+    if not texts:
+        return []
+    keys = [_embedding_key(text, model) for text in texts]
+    cached = _fetch_cached_embeddings(keys)
+
+    # Each distinct missing text is sent to the API once, even if repeated.
+    misses: dict[bytes, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in misses:
+            misses[key] = text
+
+    if misses:
+        client = _openai_client()
+        miss_keys = list(misses)
+        fresh: list[list[float]] = []
+        for batch in _iter_batches(list(misses.values()), batch_size):
+            response = client.embeddings.create(model=model, input=batch)
+            fresh.extend(item.embedding for item in response.data)
+        _store_cached_embeddings([(key, model, embedding) for key, embedding in zip(miss_keys, fresh, strict=True)])
+        cached.update(zip(miss_keys, fresh))
+
+    return [cached[key] for key in keys]
+
+
+@contextmanager
+def _conn_scope(conn: psycopg.Connection | None) -> Iterator[psycopg.Connection]:
+    """Run on the caller's connection (caller commits), or borrow one and commit."""
+    if conn is not None:
+        yield conn
+        return
+    with get_conn() as owned:
+        yield owned
+        owned.commit()
+
+
+def upsert_document(
+    drive_file: DriveFile,
+    status: str,
+    content_hash: str | None,
+    error: str | None = None,
+    conn: psycopg.Connection | None = None,
+) -> None:
+    with _conn_scope(conn) as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -53,52 +180,71 @@ def upsert_document(drive_file: DriveFile, status: str, content_hash: str | None
                     error,
                 ),
             )
-        conn.commit()
 
 
-def get_existing_document(drive_file_id: str) -> dict | None:
+def get_existing_documents() -> dict[str, dict]:
+    """Load every known document once, keyed by drive_file_id."""
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT drive_file_id, modified_time, folder_path, content_hash FROM documents WHERE drive_file_id=%s",
-                (drive_file_id,),
-            )
-            row = cur.fetchone()
-            if not row:
-                return None
+            cur.execute("SELECT drive_file_id, modified_time, folder_path, content_hash, status FROM documents")
             return {
-                "drive_file_id": row[0],
-                "modified_time": row[1],
-                "folder_path": row[2],
-                "content_hash": row[3],
+                row[0]: {
+                    "drive_file_id": row[0],
+                    "modified_time": row[1],
+                    "folder_path": row[2],
+                    "content_hash": row[3],
+                    "status": row[4],
+                }
+                for row in cur.fetchall()
             }
 
 
-def replace_chunks(drive_file_id: str, chunks: Sequence[ChunkRecord], embeddings: Sequence[list[float]]) -> int:
-    with get_conn() as conn:
+CHUNK_COPY_COLUMNS = (
+    "chunk_id",
+    "drive_file_id",
+    "doc_title",
+    "folder_path",
+    "doc_modified_time",
+    "doc_url",
+    "source_type",
+    "page_or_slide",
+    "text_origin",
+    "text",
+    "embedding",
+)
+CHUNK_COPY_TYPES = ["uuid", "text", "text", "text", "timestamptz", "text", "text", "int4", "text", "text", "halfvec"]
+
+
+def replace_chunks(
+    drive_file_id: str,
+    chunks: Sequence[ChunkRecord],
+    embeddings: Sequence[list[float]],
+    conn: psycopg.Connection | None = None,
+) -> int:
+    rows = [
+        (
+            uuid.uuid4(),
+            chunk.drive_file_id,
+            chunk.doc_title,
+            chunk.folder_path,
+            chunk.doc_modified_time,
+            chunk.doc_url,
+            chunk.source_type,
+            chunk.page_or_slide,
+            chunk.text_origin,
+            chunk.text,
+            # pgvector-python >= 0.5 binary dumpers expect HalfVector, not list.
+            HalfVector(embedding),
+        )
+        for chunk, embedding in zip(chunks, embeddings, strict=True)
+    ]
+    with _conn_scope(conn) as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM chunks WHERE drive_file_id=%s", (drive_file_id,))
-            for chunk, embedding in zip(chunks, embeddings, strict=True):
-                cur.execute(
-                    """
-                    INSERT INTO chunks
-                    (chunk_id, drive_file_id, doc_title, folder_path, doc_modified_time, doc_url,
-                     source_type, page_or_slide, text_origin, text, embedding)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    """,
-                    (
-                        str(uuid.uuid4()),
-                        chunk.drive_file_id,
-                        chunk.doc_title,
-                        chunk.folder_path,
-                        chunk.doc_modified_time,
-                        chunk.doc_url,
-                        chunk.source_type,
-                        chunk.page_or_slide,
-                        chunk.text_origin,
-                        chunk.text,
-                        embedding,
-                    ),
-                )
-        conn.commit()
-    return len(chunks)
+            # Binary COPY streams every row in one round trip, inside the same
+            # transaction as the DELETE.
+            with cur.copy(f"COPY chunks ({', '.join(CHUNK_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT BINARY)") as copy:
+                copy.set_types(CHUNK_COPY_TYPES)
+                for row in rows:
+                    copy.write_row(row)
+    return len(rows)
@@ -3,18 +3,21 @@ from __future__ import annotations
 import argparse
 import logging
 import os
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 
-from db.client import init_db
+from db.client import get_conn, init_db
 from ingest.chunking import build_chunks
 from ingest.drive_sync import PublicDriveWebProvider, content_hash, resolve_drive_folder_id
 from ingest.embed_and_upsert import (
+    EMBED_BATCH_SIZE,
     embed_texts,
-    get_existing_document,
+    get_existing_documents,
     replace_chunks,
     upsert_document,
 )
+from ingest.models import ChunkRecord, DriveFile
 from ingest.parse_pdf import parse_pdf
 from ingest.parse_pptx import parse_pptx
 
@@ -23,6 +26,7 @@ logger = logging.getLogger(__name__)
 
 PDF_MIME = "application/pdf"
 PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+EMBED_WORKERS = 4
 
 
 @dataclass
@@ -34,10 +38,29 @@ class Summary:
     chunks_inserted: int = 0
     ocr_pages: int = 0
 
+    def add(self, other: Summary) -> None:
+        self.scanned += other.scanned
+        self.ingested += other.ingested
+        self.skipped += other.skipped
+        self.failed += other.failed
+        self.chunks_inserted += other.chunks_inserted
+        self.ocr_pages += other.ocr_pages
+
+
+@dataclass
+class PendingFile:
+    drive_file: DriveFile
+    file_hash: str
+    chunks: list[ChunkRecord] = field(default_factory=list)
+
 
 def should_ingest(existing: dict | None, new_modified_time, new_folder_path: str, new_hash: str, force_all: bool) -> bool:
     if force_all or not existing:
         return True
+    # Failed files are retried even when nothing about them changed; a batch
+    # embedding failure marks files failed that were never at fault.
+    if existing.get("status") != "indexed":
+        return True
     if existing["folder_path"] != new_folder_path:
         return True
     if existing["modified_time"] != new_modified_time:
@@ -53,6 +76,44 @@ def parse_file(file_path, mime_type: str, text_min_chars: int):
     return [], 0
 
 
+def flush_pending(pending: list[PendingFile], batch_size: int) -> Summary:
+    """Embed the chunks of several files together, then write each file's rows."""
+    result = Summary()
+    texts = [chunk.text for item in pending for chunk in item.chunks]
+    try:
+        embeddings = embed_texts(texts, batch_size=batch_size) if texts else []
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Failed to embed batch of %d files", len(pending))
+        for item in pending:
+            upsert_document(item.drive_file, status="failed", content_hash=item.file_hash, error=str(exc))
+            result.failed += 1
+        return result
+
+    offset = 0
+    for item in pending:
+        file_embeddings = embeddings[offset : offset + len(item.chunks)]
+        offset += len(item.chunks)
+        try:
+            # The document row and its chunks commit together, so a failure cannot
+            # leave new chunks behind a stale document status. The document is
+            # written first so chunks of a new file satisfy their foreign key.
+            with get_conn() as conn:
+                upsert_document(item.drive_file, status="indexed", content_hash=item.file_hash, conn=conn)
+                inserted = (
+                    replace_chunks(item.drive_file.drive_file_id, item.chunks, file_embeddings, conn=conn)
+                    if item.chunks
+                    else 0
+                )
+                conn.commit()
+            result.ingested += 1
+            result.chunks_inserted += inserted
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Failed to ingest file %s", item.drive_file.drive_file_id)
+            upsert_document(item.drive_file, status="failed", content_hash=item.file_hash, error=str(exc))
+            result.failed += 1
+    return result
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--force-all", action="store_true")
@@ -61,6 +122,7 @@ def main() -> None:
     parser.add_argument("--text-min-chars", type=int, default=80)
     parser.add_argument("--chunk-size", type=int, default=1000)
     parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
     args = parser.parse_args()
 
     init_db()
@@ -68,43 +130,66 @@ def main() -> None:
 
     provider = PublicDriveWebProvider()
     threshold = datetime.now(timezone.utc) - timedelta(days=args.since_days)
+    existing_by_id = get_existing_documents()
+    known_mtimes = None
+    if not args.force_all:
+        known_mtimes = {
+            file_id: doc["modified_time"]
+            for file_id, doc in existing_by_id.items()
+            if doc["status"] == "indexed" and doc["modified_time"] is not None
+        }
+
+    # Chunks from several files are queued and embedded together; flushes run on
+    # worker threads so embedding/DB I/O overlaps with downloading and parsing.
+    pending: list[PendingFile] = []
+    pending_texts = 0
+    flushes: list[Future[Summary]] = []
+
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as executor:
+        for drive_file in provider.list_files_recursive(resolve_drive_folder_id(), known_mtimes):
+            summary.scanned += 1
+
+            if args.force_file_id and drive_file.drive_file_id != args.force_file_id:
+                continue
 
-    for drive_file in provider.list_files_recursive(resolve_drive_folder_id()):
-        summary.scanned += 1
-
-        if args.force_file_id and drive_file.drive_file_id != args.force_file_id:
-            continue
+            if drive_file.mime_type not in {PDF_MIME, PPTX_MIME}:
+                summary.skipped += 1
+                continue
 
-        if drive_file.mime_type not in {PDF_MIME, PPTX_MIME}:
-            summary.skipped += 1
-            continue
+            existing = existing_by_id.get(drive_file.drive_file_id)
+            file_hash = drive_file.content_hash or content_hash(drive_file.local_path)
 
-        existing = get_existing_document(drive_file.drive_file_id)
-        file_hash = content_hash(drive_file.local_path)
+            if not args.force_all and drive_file.modified_time and drive_file.modified_time < threshold and not args.force_file_id:
+                if existing and existing.get("status") == "indexed" and existing.get("content_hash") == file_hash:
+                    summary.skipped += 1
+                    continue
 
-        if not args.force_all and drive_file.modified_time and drive_file.modified_time < threshold and not args.force_file_id:
-            if existing and existing.get("content_hash") == file_hash:
+            if not should_ingest(existing, drive_file.modified_time, drive_file.folder_path, file_hash, args.force_all):
                 summary.skipped += 1
                 continue
 
-        if not should_ingest(existing, drive_file.modified_time, drive_file.folder_path, file_hash, args.force_all):
-            summary.skipped += 1
-            continue
+            try:
+                units, ocr_count = parse_file(drive_file.local_path, drive_file.mime_type, args.text_min_chars)
+                summary.ocr_pages += ocr_count
+                chunks = build_chunks(drive_file, units, chunk_size=args.chunk_size, overlap=args.chunk_overlap)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Failed to ingest file %s", drive_file.drive_file_id)
+                upsert_document(drive_file, status="failed", content_hash=file_hash, error=str(exc))
+                summary.failed += 1
+                continue
 
-        try:
-            units, ocr_count = parse_file(drive_file.local_path, drive_file.mime_type, args.text_min_chars)
-            summary.ocr_pages += ocr_count
-            chunks = build_chunks(drive_file, units, chunk_size=args.chunk_size, overlap=args.chunk_overlap)
-            embeddings = embed_texts([chunk.text for chunk in chunks]) if chunks else []
-            inserted = replace_chunks(drive_file.drive_file_id, chunks, embeddings) if chunks else 0
-            upsert_document(drive_file, status="indexed", content_hash=file_hash)
-            summary.ingested += 1
-            summary.chunks_inserted += inserted
-        except Exception as exc:  # noqa: BLE001
-            logger.exception("Failed to ingest file %s", drive_file.drive_file_id)
-            upsert_document(drive_file, status="failed", content_hash=file_hash, error=str(exc))
-            summary.failed += 1
-            continue
+            pending.append(PendingFile(drive_file=drive_file, file_hash=file_hash, chunks=chunks))
+            pending_texts += len(chunks)
+            if pending_texts >= args.embed_batch_size:
+                flushes.append(executor.submit(flush_pending, pending, args.embed_batch_size))
+                pending = []
+                pending_texts = 0
+
+        if pending:
+            flushes.append(executor.submit(flush_pending, pending, args.embed_batch_size))
+
+        for flush in flushes:
+            summary.add(flush.result())
 
     logger.info(
         "Ingestion summary: scanned=%d ingested=%d skipped=%d failed=%d chunks_inserted=%d ocr_pages=%d",
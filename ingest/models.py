@@ -15,6 +15,7 @@ class DriveFile:
     modified_time: datetime | None
     local_path: Path
     doc_url: str
+    content_hash: str | None = None
 
 
 @dataclass
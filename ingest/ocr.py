@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import os
 from io import BytesIO
 
 import pytesseract
 from PIL import Image
 
+# Pages are OCR'd in parallel by the callers; keep each tesseract process
+# single-threaded so workers do not oversubscribe the CPU.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
 MIN_IMAGE_WIDTH = 500
 MIN_IMAGE_HEIGHT = 300
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
 
 
 def should_ocr_image(image_bytes: bytes) -> bool:
@@ -15,7 +20,18 @@ def should_ocr_image(image_bytes: bytes) -> bool:
         return img.width >= MIN_IMAGE_WIDTH and img.height >= MIN_IMAGE_HEIGHT
 
 
+def should_ocr_pix(pix) -> bool:
+    """Size check for a PyMuPDF pixmap, read from its header without encoding."""
+    return pix.width >= MIN_IMAGE_WIDTH and pix.height >= MIN_IMAGE_HEIGHT
+
+
 def run_ocr(image_bytes: bytes) -> str:
     # TODO: improve pre-processing for noisy scans.
     with Image.open(BytesIO(image_bytes)) as img:
         return pytesseract.image_to_string(img).strip()
+
+
+def run_ocr_pixels(samples: bytes, width: int, height: int, mode: str = "RGB") -> str:
+    """OCR raw pixel data (e.g. a PyMuPDF pixmap) without an image encode/decode round trip."""
+    img = Image.frombytes(mode, (width, height), samples)
+    return pytesseract.image_to_string(img).strip()
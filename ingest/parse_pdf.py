@@ -1,65 +1,66 @@
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 import fitz
 
 from ingest.models import ExtractedUnit
-from ingest.ocr import run_ocr, should_ocr_image
+from ingest.ocr import OCR_WORKERS, run_ocr_pixels, should_ocr_pix
+
+
+def _page_unit(idx: int, text: str, text_origin: str) -> ExtractedUnit:
+    return ExtractedUnit(
+        source_type="pdf_page",
+        page_or_slide=idx,
+        text=text,
+        text_origin=text_origin,
+    )
 
 
 def parse_pdf(path: Path, text_min_chars: int) -> tuple[list[ExtractedUnit], int]:
-    units: list[ExtractedUnit] = []
+    units_by_page: dict[int, ExtractedUnit] = {}
     ocr_count = 0
 
+    # Tesseract runs as a subprocess, so threads are enough to OCR pages in
+    # parallel while this thread keeps rendering. At most 2x workers rendered
+    # pages are held in memory at once.
+    in_flight: deque[tuple[int, str, Future[str]]] = deque()
+    max_in_flight = 2 * OCR_WORKERS
+
+    def collect_oldest() -> None:
+        nonlocal ocr_count
+        idx, native_text, future = in_flight.popleft()
+        ocr_text = future.result()
+        if ocr_text:
+            units_by_page[idx] = _page_unit(idx, ocr_text, "ocr")
+            ocr_count += 1
+        elif native_text:
+            units_by_page[idx] = _page_unit(idx, native_text, "native_text")
+
     doc = fitz.open(path)
     try:
-        for idx, page in enumerate(doc, start=1):
-            native_text = page.get_text("text").strip()
-            if len(native_text) >= text_min_chars:
-                units.append(
-                    ExtractedUnit(
-                        source_type="pdf_page",
-                        page_or_slide=idx,
-                        text=native_text,
-                        text_origin="native_text",
-                    )
-                )
-                continue
+        with ThreadPoolExecutor(max_workers=OCR_WORKERS) as pool:
+            for idx, page in enumerate(doc, start=1):
+                native_text = page.get_text("text").strip()
+                if len(native_text) >= text_min_chars:
+                    units_by_page[idx] = _page_unit(idx, native_text, "native_text")
+                    continue
 
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-            image_bytes = pix.tobytes("png")
-            if should_ocr_image(image_bytes):
-                ocr_text = run_ocr(image_bytes)
-                if ocr_text:
-                    units.append(
-                        ExtractedUnit(
-                            source_type="pdf_page",
-                            page_or_slide=idx,
-                            text=ocr_text,
-                            text_origin="ocr",
-                        )
-                    )
-                    ocr_count += 1
+                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
+                if should_ocr_pix(pix):
+                    mode = "RGBA" if pix.alpha else "RGB"
+                    future = pool.submit(run_ocr_pixels, pix.samples, pix.width, pix.height, mode)
+                    in_flight.append((idx, native_text, future))
+                    if len(in_flight) >= max_in_flight:
+                        collect_oldest()
                 elif native_text:
-                    units.append(
-                        ExtractedUnit(
-                            source_type="pdf_page",
-                            page_or_slide=idx,
-                            text=native_text,
-                            text_origin="native_text",
-                        )
-                    )
-            elif native_text:
-                units.append(
-                    ExtractedUnit(
-                        source_type="pdf_page",
-                        page_or_slide=idx,
-                        text=native_text,
-                        text_origin="native_text",
-                    )
-                )
+                    units_by_page[idx] = _page_unit(idx, native_text, "native_text")
+
+            while in_flight:
+                collect_oldest()
     finally:
         doc.close()
 
-    return units, ocr_count
+    return [units_by_page[idx] for idx in sorted(units_by_page)], ocr_count
@@ -3,25 +3,33 @@ from __future__ import annotations
 from pathlib import Path
 
 from pptx import Presentation
+from pptx.shapes.group import GroupShape
+from pptx.shapes.picture import Picture
 
 from ingest.models import ExtractedUnit
 from ingest.ocr import run_ocr, should_ocr_image
 
 
-def _slide_native_text(slide) -> str:
-    chunks: list[str] = []
-    for shape in slide.shapes:
-        if hasattr(shape, "text") and shape.text:
-            chunks.append(shape.text.strip())
-    return "\n".join(t for t in chunks if t)
+def _collect_shapes(shapes, texts: list[str], images: list[bytes]) -> None:
+    # isinstance rather than shape.shape_type: the latter raises
+    # NotImplementedError for some autoshapes, which would fail the whole deck.
+    for shape in shapes:
+        if isinstance(shape, GroupShape):
+            _collect_shapes(shape.shapes, texts, images)
+            continue
+        text = getattr(shape, "text", None)
+        if text:
+            texts.append(text.strip())
+        if isinstance(shape, Picture):
+            images.append(shape.image.blob)
 
 
-def _slide_image_blobs(slide) -> list[bytes]:
+def _scan_slide(slide) -> tuple[str, list[bytes]]:
+    """Return a slide's native text and picture blobs from one walk of its shapes."""
+    texts: list[str] = []
     images: list[bytes] = []
-    for shape in slide.shapes:
-        if getattr(shape, "shape_type", None) == 13 and hasattr(shape, "image"):
-            images.append(shape.image.blob)
-    return images
+    _collect_shapes(slide.shapes, texts, images)
+    return "\n".join(t for t in texts if t), images
 
 
 def parse_pptx(path: Path, text_min_chars: int) -> tuple[list[ExtractedUnit], int]:
@@ -30,7 +38,7 @@ def parse_pptx(path: Path, text_min_chars: int) -> tuple[list[ExtractedUnit], in
     ocr_count = 0
 
     for idx, slide in enumerate(prs.slides, start=1):
-        native_text = _slide_native_text(slide)
+        native_text, image_blobs = _scan_slide(slide)
         if len(native_text) >= text_min_chars:
             units.append(
                 ExtractedUnit(
@@ -43,7 +51,7 @@ def parse_pptx(path: Path, text_min_chars: int) -> tuple[list[ExtractedUnit], in
             continue
 
         ocr_fragments: list[str] = []
-        for blob in _slide_image_blobs(slide):
+        for blob in image_blobs:
             if not should_ocr_image(blob):
                 continue
             extracted = run_ocr(blob)